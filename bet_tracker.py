@@ -2,68 +2,349 @@
 Bet Tracker - Records all arbitrage bets and calculates P&L
 """
 
-import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import atexit
+import os
+import queue
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from operator import itemgetter
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 import sqlite3
+import threading
+import time
+
+
+# Hot-path statements, kept as constants so the connection's statement
+# cache reuses the same prepared statement on every call
+_SQL_INSERT_OPP = """
+    INSERT INTO opportunities (
+        event, sport, commence_time, profit_percent,
+        total_stake, guaranteed_profit, timestamp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# RETURNING needs SQLite 3.35+; older libraries fall back to cursor.lastrowid
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+_SQL_INSERT_OPP_RETURNING = _SQL_INSERT_OPP + "    RETURNING id\n"
+
+_SQL_INSERT_BET = """
+    INSERT INTO bets (
+        opportunity_id, outcome, bookmaker, odds,
+        stake, potential_return
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_UPDATE_BET_PLACED = """
+    UPDATE bets
+    SET placed_at = ?
+    WHERE opportunity_id = ?
+"""
+
+_SQL_UPDATE_OPP_PLACED = """
+    UPDATE opportunities
+    SET status = 'placed'
+    WHERE id = ?
+"""
+
+_SQL_SETTLE_BET = """
+    UPDATE bets
+    SET settled_at = ?,
+        result = ?,
+        actual_return = ?
+    WHERE id = ?
+"""
+
+_SQL_UPSERT_BALANCE = """
+    INSERT INTO balances (bookmaker, balance, last_updated)
+    VALUES (?, ?, ?)
+    ON CONFLICT(bookmaker) DO UPDATE SET
+        balance = excluded.balance,
+        last_updated = excluded.last_updated
+"""
+
+# A user's own stake on an opportunity; the profit scales the opportunity's
+# guaranteed profit (logged at its total_stake) to that stake
+_SQL_INSERT_PLACED_BET = """
+    INSERT INTO placed_bets (ts, user_id, opportunity_id, event, stake, profit)
+    SELECT ?, ?, id, event, ?, guaranteed_profit * ? / total_stake
+    FROM opportunities
+    WHERE id = ?
+"""
+
+_SQL_UPSERT_USER_SETTINGS = """
+    INSERT INTO user_settings (
+        user_id, min_profit, default_stake, notifications_enabled, sports_filter
+    ) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        min_profit = excluded.min_profit,
+        default_stake = excluded.default_stake,
+        notifications_enabled = excluded.notifications_enabled,
+        sports_filter = excluded.sports_filter
+"""
+
+# Opportunity count plus placed-bet count, profit and ROI in a single pass
+_SQL_STATS = """
+    SELECT
+        COUNT(*),
+        COUNT(CASE WHEN status = 'placed' THEN 1 END),
+        SUM(CASE WHEN status = 'placed' THEN guaranteed_profit END),
+        AVG(CASE WHEN status = 'placed' THEN profit_percent END)
+    FROM opportunities
+    WHERE timestamp > ?
+"""
+
+# One user's placed bets, profit and ROI (an index search on idx_placed_user_ts)
+_SQL_USER_STATS = """
+    SELECT
+        COUNT(*),
+        SUM(stake),
+        SUM(profit)
+    FROM placed_bets
+    WHERE user_id = ? AND ts > ?
+"""
+
+# Daily report figures: today's counts/profit/ROI and this week's placed bets
+_SQL_REPORT_STATS = """
+    SELECT
+        COUNT(CASE WHEN timestamp > :day THEN 1 END),
+        COUNT(CASE WHEN timestamp > :day AND status = 'placed' THEN 1 END),
+        SUM(CASE WHEN timestamp > :day AND status = 'placed' THEN guaranteed_profit END),
+        AVG(CASE WHEN timestamp > :day AND status = 'placed' THEN profit_percent END),
+        COUNT(CASE WHEN status = 'placed' THEN 1 END),
+        SUM(CASE WHEN status = 'placed' THEN guaranteed_profit END)
+    FROM opportunities
+    WHERE timestamp > :week
+"""
+
+# Look-back window (in days) for each stats period; 'all' has no cutoff
+_PERIOD_DAYS = {'day': 1, 'week': 7, 'month': 30}
+
+
+def _timestamp() -> str:
+    """Current local time as stored in the database (ISO 8601, whole seconds)"""
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _period_cutoff(period: str) -> str:
+    """Timestamp marking the start of a stats period ('all' starts at the epoch)"""
+    days = _PERIOD_DAYS.get(period)
+    if days is None:
+        return '1970-01-01'
+    return (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds')
 
 
 class BetTracker:
     """Track all arbitrage bets and calculate profits"""
     
+    # How long (seconds) a cached get_stats() result stays valid
+    STATS_CACHE_TTL = 30
+    
     def __init__(self, db_path: str = "bets.db"):
         self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Initialize SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create arbitrage opportunities table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS opportunities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event TEXT NOT NULL,
-                sport TEXT NOT NULL,
-                commence_time TEXT,
-                profit_percent REAL,
-                total_stake REAL,
-                guaranteed_profit REAL,
-                timestamp TEXT NOT NULL,
-                status TEXT DEFAULT 'pending'
-            )
-        """)
         
-        # Create individual bets table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                opportunity_id INTEGER,
-                outcome TEXT NOT NULL,
-                bookmaker TEXT NOT NULL,
-                odds REAL NOT NULL,
-                stake REAL NOT NULL,
-                potential_return REAL NOT NULL,
-                placed_at TEXT,
-                settled_at TEXT,
-                result TEXT,
-                actual_return REAL,
-                FOREIGN KEY (opportunity_id) REFERENCES opportunities(id)
-            )
+        # Single long-lived connection shared by all methods (guarded by _lock)
+        self._conn = sqlite3.connect(
+            db_path, isolation_level=None, check_same_thread=False, cached_statements=128
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        
+        # auto_vacuum and page_size only take effect on a new database and
+        # must be set before the switch to WAL writes the file header
+        self._conn.executescript("""
+            PRAGMA auto_vacuum=INCREMENTAL;
+            PRAGMA page_size=4096;
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA busy_timeout=5000;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-20000;
+            PRAGMA foreign_keys=ON;
         """)
         
-        # Create bookmaker balances table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS balances (
-                bookmaker TEXT PRIMARY KEY,
-                balance REAL NOT NULL,
-                last_updated TEXT NOT NULL
-            )
-        """)
+        # In-memory snapshots of the dashboard reads, cleared whenever this
+        # tracker writes (time-windowed stats also expire after STATS_CACHE_TTL)
+        self._stats_cache: Dict[str, tuple] = {}
+        self._balances_cache: Optional[Dict[str, float]] = None
+        self._pending_cache: Optional[List[Dict]] = None
+        # Bumped on every invalidation; a read only fills the cache if no
+        # write landed while it was running, so stale rows are never cached
+        # (_cache_lock makes the check-and-store atomic with invalidation)
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
+        
+        self.init_database()
         
-        conn.commit()
-        conn.close()
+        # Pool of read-only connections so queries don't queue behind writes.
+        # An in-memory database is private to its connection, so it has none.
+        # Once closed, the queue only holds a None sentinel (see close()).
+        self._readers: Optional[queue.Queue] = None
+        self._readers_lock = threading.Lock()
+        if db_path != ':memory:':
+            self._readers = queue.Queue()
+            reader_uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+            for _ in range(os.cpu_count() or 1):
+                reader = sqlite3.connect(
+                    reader_uri, uri=True, check_same_thread=False, cached_statements=128
+                )
+                reader.row_factory = sqlite3.Row
+                reader.execute("PRAGMA busy_timeout=5000")
+                self._readers.put(reader)
+        
+        # Recommended once at startup for long-lived connections;
+        # close() runs the plain form before disconnecting
+        self._conn.execute("PRAGMA optimize=0x10002")
+        self._closed = False
+        atexit.register(self.close)
+    
+    def init_database(self):
+        """Initialize SQLite database"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            
+            # Create arbitrage opportunities table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS opportunities (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event TEXT NOT NULL,
+                    sport TEXT NOT NULL,
+                    commence_time TEXT,
+                    profit_percent REAL,
+                    total_stake REAL,
+                    guaranteed_profit REAL,
+                    timestamp TEXT NOT NULL,
+                    status TEXT DEFAULT 'pending'
+                )
+            """)
+            
+            # Create individual bets table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS bets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    opportunity_id INTEGER,
+                    outcome TEXT NOT NULL,
+                    bookmaker TEXT NOT NULL,
+                    odds REAL NOT NULL,
+                    stake REAL NOT NULL,
+                    potential_return REAL NOT NULL,
+                    placed_at TEXT,
+                    settled_at TEXT,
+                    result TEXT,
+                    actual_return REAL,
+                    FOREIGN KEY (opportunity_id) REFERENCES opportunities(id)
+                )
+            """)
+            
+            # Create bookmaker balances table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS balances (
+                    bookmaker TEXT PRIMARY KEY,
+                    balance REAL NOT NULL,
+                    last_updated TEXT NOT NULL
+                )
+            """)
+            
+            # Create per-user bot settings table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_settings (
+                    user_id INTEGER PRIMARY KEY,
+                    min_profit REAL NOT NULL,
+                    default_stake REAL NOT NULL,
+                    notifications_enabled INTEGER NOT NULL,
+                    sports_filter TEXT NOT NULL
+                )
+            """)
+            
+            # Create per-user placed bets table (one row per "Placed All Bets")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS placed_bets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    opportunity_id INTEGER,
+                    event TEXT NOT NULL,
+                    stake REAL NOT NULL,
+                    profit REAL NOT NULL,
+                    FOREIGN KEY (opportunity_id) REFERENCES opportunities(id)
+                )
+            """)
+            
+            # Indexes for status/time filters and the opportunity -> bets join
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_opp_status_ts
+                ON opportunities (status, timestamp DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_bet_opp
+                ON bets (opportunity_id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_placed_user_ts
+                ON placed_bets (user_id, ts)
+            """)
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in a single write transaction"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+    
+    @contextmanager
+    def _ro_conn(self):
+        """Borrow a read-only connection from the pool"""
+        if self._readers is None:
+            with self._lock:
+                yield self._conn
+            return
+        
+        conn = self._readers.get()
+        if conn is None:
+            # Closed: pass the sentinel on to the next waiting reader
+            self._readers.put(None)
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._readers.put(conn)
+    
+    def _invalidate_caches(self):
+        """Drop cached reads after a write"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._stats_cache.clear()
+            self._balances_cache = None
+            self._pending_cache = None
+    
+    def close(self):
+        """Close the database connections"""
+        with self._readers_lock:
+            if self._closed:
+                return
+            self._closed = True
+            
+            # Borrowed readers are closed when they are returned
+            if self._readers is not None:
+                while not self._readers.empty():
+                    self._readers.get_nowait().close()
+                self._readers.put(None)
+        atexit.unregister(self.close)
+        
+        with self._lock:
+            # Let SQLite refresh planner statistics before disconnecting
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
     
     def log_opportunity(self, opportunity: Dict, stakes: Dict, total_stake: float) -> int:
         """
@@ -71,71 +352,88 @@ class BetTracker:
         
         Returns the opportunity ID
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Calculate guaranteed profit
-        first_return = list(stakes.values())[0]['potential_return']
-        guaranteed_profit = first_return - total_stake
-        
-        # Insert opportunity
-        cursor.execute("""
-            INSERT INTO opportunities (
-                event, sport, commence_time, profit_percent, 
-                total_stake, guaranteed_profit, timestamp
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            opportunity['event'],
-            opportunity['sport'],
-            opportunity.get('commence_time', ''),
-            opportunity['profit_percent'],
-            total_stake,
-            guaranteed_profit,
-            datetime.now().isoformat()
-        ))
-        
-        opportunity_id = cursor.lastrowid
-        
-        # Insert individual bets
-        for outcome, stake_data in stakes.items():
-            cursor.execute("""
-                INSERT INTO bets (
-                    opportunity_id, outcome, bookmaker, odds, 
-                    stake, potential_return
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                opportunity_id,
-                outcome,
-                stake_data['bookmaker'],
-                stake_data['odds'],
-                stake_data['stake'],
-                stake_data['potential_return']
-            ))
+        return self.log_opportunities([(opportunity, stakes, total_stake)])[0]
+    
+    def log_opportunities(self, entries: List[Tuple[Dict, Dict, float]]) -> List[int]:
+        """
+        Log several opportunities in one transaction
         
-        conn.commit()
-        conn.close()
+        Args:
+            entries: (opportunity, stakes, total_stake) for each opportunity,
+                     e.g. every new arbitrage from one scan
         
-        return opportunity_id
+        Returns the opportunity IDs, in the same order
+        """
+        ts = _timestamp()
+        opportunity_ids = []
+        
+        with self._transaction() as cursor:
+            for opportunity, stakes, total_stake in entries:
+                # Calculate guaranteed profit
+                first_return = next(iter(stakes.values()))['potential_return']
+                guaranteed_profit = first_return - total_stake
+                
+                # Insert opportunity
+                params = (
+                    opportunity['event'],
+                    opportunity['sport'],
+                    opportunity.get('commence_time', ''),
+                    opportunity['profit_percent'],
+                    total_stake,
+                    guaranteed_profit,
+                    ts
+                )
+                if _HAS_RETURNING:
+                    cursor.execute(_SQL_INSERT_OPP_RETURNING, params)
+                    opportunity_id = cursor.fetchone()[0]
+                else:
+                    cursor.execute(_SQL_INSERT_OPP, params)
+                    opportunity_id = cursor.lastrowid
+                
+                # Insert individual bets in one batch
+                cursor.executemany(_SQL_INSERT_BET, [
+                    (
+                        opportunity_id,
+                        outcome,
+                        stake_data['bookmaker'],
+                        stake_data['odds'],
+                        stake_data['stake'],
+                        stake_data['potential_return']
+                    )
+                    for outcome, stake_data in stakes.items()
+                ])
+                opportunity_ids.append(opportunity_id)
+        
+        self._invalidate_caches()
+        return opportunity_ids
     
     def mark_bets_placed(self, opportunity_id: int):
         """Mark that bets for this opportunity have been placed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE bets 
-            SET placed_at = ? 
-            WHERE opportunity_id = ?
-        """, (datetime.now().isoformat(), opportunity_id))
-        
-        cursor.execute("""
-            UPDATE opportunities 
-            SET status = 'placed' 
-            WHERE id = ?
-        """, (opportunity_id,))
-        
-        conn.commit()
-        conn.close()
+        ts = _timestamp()
+        
+        with self._transaction() as cursor:
+            cursor.execute(_SQL_UPDATE_BET_PLACED, (ts, opportunity_id))
+            cursor.execute(_SQL_UPDATE_OPP_PLACED, (opportunity_id,))
+        
+        self._invalidate_caches()
+    
+    def record_placed_bet(self, user_id: int, opportunity_id: int, stake: float):
+        """
+        Record that a user placed their bets on an opportunity
+        
+        Args:
+            user_id: Telegram user who placed the bets
+            opportunity_id: ID returned by log_opportunity
+            stake: Total amount the user staked
+        """
+        ts = _timestamp()
+        
+        with self._transaction() as cursor:
+            cursor.execute(_SQL_INSERT_PLACED_BET, (ts, user_id, stake, stake, opportunity_id))
+            cursor.execute(_SQL_UPDATE_BET_PLACED, (ts, opportunity_id))
+            cursor.execute(_SQL_UPDATE_OPP_PLACED, (opportunity_id,))
+        
+        self._invalidate_caches()
     
     def settle_bet(self, bet_id: int, won: bool, actual_return: float = 0):
         """
@@ -146,48 +444,53 @@ class BetTracker:
             won: Whether this bet won
             actual_return: Actual return received (if won)
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE bets 
-            SET settled_at = ?, 
-                result = ?, 
-                actual_return = ?
-            WHERE id = ?
-        """, (
-            datetime.now().isoformat(),
-            'won' if won else 'lost',
-            actual_return if won else 0,
-            bet_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        self.settle_bets([(bet_id, won, actual_return)])
     
-    def get_pending_opportunities(self) -> List[Dict]:
-        """Get all pending opportunities"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def settle_bets(self, results: List[Tuple[int, bool, float]]):
+        """
+        Settle several bets in one transaction
         
-        cursor.execute("""
-            SELECT * FROM opportunities 
-            WHERE status = 'pending' 
-            ORDER BY timestamp DESC
-        """)
+        Args:
+            results: (bet_id, won, actual_return) for each bet, e.g. every
+                     leg of an arbitrage once the event has finished
+        """
+        ts = _timestamp()
+        
+        with self._transaction() as cursor:
+            cursor.executemany(_SQL_SETTLE_BET, [
+                (
+                    ts,
+                    'won' if won else 'lost',
+                    actual_return if won else 0,
+                    bet_id
+                )
+                for bet_id, won, actual_return in results
+            ])
         
-        opportunities = []
-        for row in cursor.fetchall():
-            opportunities.append({
-                'id': row[0],
-                'event': row[1],
-                'sport': row[2],
-                'profit_percent': row[4],
-                'guaranteed_profit': row[6]
-            })
+        self._invalidate_caches()
+    
+    def get_pending_opportunities(self) -> List[Dict]:
+        """Get all pending opportunities"""
+        if self._pending_cache is not None:
+            return [dict(opp) for opp in self._pending_cache]
         
-        conn.close()
-        return opportunities
+        generation = self._cache_generation
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, event, sport, profit_percent, guaranteed_profit
+                FROM opportunities
+                WHERE status = 'pending'
+                ORDER BY timestamp DESC
+            """)
+            rows = cursor.fetchall()
+        
+        pending = [dict(row) for row in rows]
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._pending_cache = pending
+        return [dict(opp) for opp in pending]
     
     def get_stats(self, period: str = 'all') -> Dict:
         """
@@ -196,86 +499,137 @@ class BetTracker:
         Args:
             period: 'day', 'week', 'month', or 'all'
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Build time filter
-        time_filter = ""
-        if period == 'day':
-            time_filter = "WHERE timestamp > datetime('now', '-1 day')"
-        elif period == 'week':
-            time_filter = "WHERE timestamp > datetime('now', '-7 days')"
-        elif period == 'month':
-            time_filter = "WHERE timestamp > datetime('now', '-30 days')"
-        
-        # Get total opportunities
-        cursor.execute(f"SELECT COUNT(*) FROM opportunities {time_filter}")
-        total_opportunities = cursor.fetchone()[0]
-        
-        # Get placed bets
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM opportunities 
-            {time_filter.replace('WHERE', 'AND') if time_filter else 'WHERE status = "placed"'}
-            {'AND' if time_filter else 'WHERE'} status = 'placed'
-        """)
-        placed_count = cursor.fetchone()[0]
-        
-        # Get total guaranteed profit from placed bets
-        cursor.execute(f"""
-            SELECT SUM(guaranteed_profit) FROM opportunities 
-            {time_filter.replace('WHERE', 'AND') if time_filter else 'WHERE status = "placed"'}
-            {'AND' if time_filter else 'WHERE'} status = 'placed'
-        """)
-        total_profit = cursor.fetchone()[0] or 0
-        
-        # Get average profit percent
-        cursor.execute(f"""
-            SELECT AVG(profit_percent) FROM opportunities 
-            {time_filter.replace('WHERE', 'AND') if time_filter else 'WHERE status = "placed"'}
-            {'AND' if time_filter else 'WHERE'} status = 'placed'
-        """)
-        avg_profit_pct = cursor.fetchone()[0] or 0
+        # 'all' has no sliding window, so only a write can change it
+        cached = self._stats_cache.get(period)
+        if cached and (period not in _PERIOD_DAYS
+                       or time.monotonic() - cached[0] < self.STATS_CACHE_TTL):
+            return dict(cached[1])
+        
+        generation = self._cache_generation
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_STATS, (_period_cutoff(period),))
+            total_opportunities, placed_count, total_profit, avg_profit_pct = cursor.fetchone()
+        
+        stats = {
+            'total_opportunities': total_opportunities,
+            'bets_placed': placed_count,
+            'total_profit': round(total_profit or 0, 2),
+            'average_roi': round(avg_profit_pct or 0, 2),
+            'period': period
+        }
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._stats_cache[period] = (time.monotonic(), stats)
+        return dict(stats)
+    
+    def get_user_stats(self, user_id: int, period: str = 'all') -> Dict:
+        """
+        Calculate one user's placed-bet statistics
         
-        conn.close()
+        Args:
+            user_id: Telegram user ID
+            period: 'day', 'week', 'month', or 'all'
+        """
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_USER_STATS, (user_id, _period_cutoff(period)))
+            placed_count, total_staked, total_profit = cursor.fetchone()
         
         return {
-            'total_opportunities': total_opportunities,
             'bets_placed': placed_count,
-            'total_profit': round(total_profit, 2),
-            'average_roi': round(avg_profit_pct, 2),
+            'total_profit': round(total_profit or 0, 2),
+            'average_roi': round(total_profit / total_staked * 100, 2) if total_staked else 0,
             'period': period
         }
     
     def update_bookmaker_balance(self, bookmaker: str, balance: float):
         """Update the balance for a bookmaker"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        ts = _timestamp()
         
-        cursor.execute("""
-            INSERT OR REPLACE INTO balances (bookmaker, balance, last_updated)
-            VALUES (?, ?, ?)
-        """, (bookmaker, balance, datetime.now().isoformat()))
+        with self._lock:
+            cursor = self._conn.cursor()
+            
+            cursor.execute(_SQL_UPSERT_BALANCE, (bookmaker, balance, ts))
         
-        conn.commit()
-        conn.close()
+        self._invalidate_caches()
     
     def get_all_balances(self) -> Dict[str, float]:
         """Get current balances across all bookmakers"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT bookmaker, balance FROM balances")
-        balances = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        conn.close()
-        return balances
+        if self._balances_cache is not None:
+            return dict(self._balances_cache)
+        
+        generation = self._cache_generation
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT bookmaker, balance FROM balances")
+            balances = {row[0]: row[1] for row in cursor.fetchall()}
+        
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._balances_cache = balances
+        return dict(balances)
+    
+    def get_user_settings(self) -> Dict[int, Dict]:
+        """Get saved bot settings for every user, keyed by user ID"""
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, min_profit, default_stake, notifications_enabled, sports_filter
+                FROM user_settings
+            """)
+            return {
+                row['user_id']: {
+                    'min_profit': row['min_profit'],
+                    'default_stake': row['default_stake'],
+                    'notifications_enabled': bool(row['notifications_enabled']),
+                    'sports_filter': row['sports_filter']
+                }
+                for row in cursor.fetchall()
+            }
+    
+    def save_user_settings(self, user_id: int, settings: Dict):
+        """Insert or update a user's bot settings"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            
+            cursor.execute(_SQL_UPSERT_USER_SETTINGS, (
+                user_id,
+                settings.get('min_profit', 2.0),
+                settings.get('default_stake', 1000),
+                int(settings.get('notifications_enabled', True)),
+                settings.get('sports_filter', 'all')
+            ))
     
     def generate_daily_report(self) -> str:
         """Generate a daily performance report"""
-        stats = self.get_stats('day')
-        week_stats = self.get_stats('week')
+        # Today's and this week's figures in a single pass over the last 7 days
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_REPORT_STATS, {
+                'day': _period_cutoff('day'),
+                'week': _period_cutoff('week')
+            })
+            (day_found, day_placed, day_profit, day_roi,
+             week_placed, week_profit) = cursor.fetchone()
+        
+        stats = {
+            'total_opportunities': day_found,
+            'bets_placed': day_placed,
+            'total_profit': round(day_profit or 0, 2),
+            'average_roi': round(day_roi or 0, 2)
+        }
+        week_stats = {
+            'bets_placed': week_placed,
+            'total_profit': round(week_profit or 0, 2)
+        }
         
-        report = f"""
+        header = f"""
 📊 **DAILY ARBITRAGE REPORT**
 Date: {datetime.now().strftime('%Y-%m-%d')}
 
@@ -295,52 +649,60 @@ Date: {datetime.now().strftime('%Y-%m-%d')}
         balances = self.get_all_balances()
         total_balance = sum(balances.values())
         
-        for bookmaker, balance in sorted(balances.items(), key=lambda x: x[1], reverse=True):
-            report += f"\n{bookmaker.upper()}: £{balance}"
-        
-        report += f"\n\n💵 **Total Across All Bookies: £{total_balance}**"
-        
-        return report
+        parts = [header]
+        parts.extend(
+            f"\n{bookmaker.upper()}: £{balance}"
+            for bookmaker, balance in sorted(balances.items(), key=itemgetter(1), reverse=True)
+        )
+        parts.append(f"\n\n💵 **Total Across All Bookies: £{total_balance}**")
+        return "".join(parts)
+    
+    def reclaim_space(self, pages: int = 1000):
+        """Return up to `pages` free pages to the filesystem (incremental auto-vacuum)"""
+        with self._lock:
+            self._conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
     
     def export_to_csv(self, filepath: str, period: str = 'all'):
-        """Export bet history to CSV for analysis"""
-        import csv
+        """
+        Export bet history to CSV for analysis
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        time_filter = ""
-        if period == 'month':
-            time_filter = "WHERE o.timestamp > datetime('now', '-30 days')"
-        
-        cursor.execute(f"""
-            SELECT 
-                o.event,
-                o.sport,
-                o.commence_time,
-                o.profit_percent,
-                o.guaranteed_profit,
-                b.outcome,
-                b.bookmaker,
-                b.odds,
-                b.stake,
-                b.placed_at,
-                b.result
-            FROM opportunities o
-            JOIN bets b ON o.id = b.opportunity_id
-            {time_filter}
-            ORDER BY o.timestamp DESC
-        """)
+        Args:
+            filepath: Destination CSV file
+            period: 'day', 'week', 'month', or 'all'
+        """
+        import csv
         
-        with open(filepath, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow([
-                'Event', 'Sport', 'Start Time', 'Profit %', 'Guaranteed Profit',
-                'Outcome', 'Bookmaker', 'Odds', 'Stake', 'Placed At', 'Result'
-            ])
-            writer.writerows(cursor.fetchall())
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT
+                    o.event,
+                    o.sport,
+                    o.commence_time,
+                    o.profit_percent,
+                    o.guaranteed_profit,
+                    b.outcome,
+                    b.bookmaker,
+                    b.odds,
+                    b.stake,
+                    b.placed_at,
+                    b.result
+                FROM opportunities o
+                JOIN bets b ON o.id = b.opportunity_id
+                WHERE o.timestamp > ?
+                ORDER BY o.timestamp DESC
+            """, (_period_cutoff(period),))
+            
+            # Stream rows straight from the cursor through a 1 MB write buffer
+            with open(filepath, 'w', newline='', buffering=1 << 20) as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow([
+                    'Event', 'Sport', 'Start Time', 'Profit %', 'Guaranteed Profit',
+                    'Outcome', 'Bookmaker', 'Odds', 'Stake', 'Placed At', 'Result'
+                ])
+                writer.writerows(cursor)
         
-        conn.close()
         print(f"Exported bet history to {filepath}")
 
 
@@ -374,3 +736,5 @@ if __name__ == "__main__":
     
     # Generate report
     print("\n" + tracker.generate_daily_report())
+    
+    tracker.close()
@@ -3,6 +3,10 @@ Configuration File for Arbitrage Bot
 Fill in your API keys and adjust settings here
 """
 
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import FrozenSet, Mapping, Optional, Tuple
+
 # =============================================================================
 # API CREDENTIALS (You need to get these)
 # =============================================================================
@@ -47,7 +51,8 @@ MAX_ALERTS_PER_SCAN = 5
 # =============================================================================
 
 # UK Bookmakers (The bot will find best odds across these)
-BOOKMAKERS = [
+# (Stored as a frozenset - order does not matter and lookups are instant)
+BOOKMAKERS = frozenset({
     'bet365',
     'williamhill',
     'paddypower',
@@ -63,7 +68,7 @@ BOOKMAKERS = [
     'virginbet',
     'spreadex',
     'livescorebet'
-]
+})
 
 
 # =============================================================================
@@ -72,7 +77,7 @@ BOOKMAKERS = [
 
 # All available sports
 # Remove any you don't want to bet on
-SPORTS = [
+SPORTS = (
     'soccer_epl',                    # Premier League
     'soccer_uefa_champs_league',     # Champions League
     'soccer_england_league1',        # League One
@@ -86,7 +91,7 @@ SPORTS = [
     'cricket_odi',                   # ODI Cricket
     'americanfootball_nfl',          # NFL
     'icehockey_nhl',                 # NHL
-]
+)
 
 
 # =============================================================================
@@ -110,7 +115,8 @@ ODDS_CHANGE_WARNING_THRESHOLD = 5.0
 
 # Update these manually as you deposit/withdraw
 # This helps the bot warn you if you don't have enough balance
-INITIAL_BALANCES = {
+# (Read-only once loaded)
+INITIAL_BALANCES = MappingProxyType({
     'bet365': 100,
     'williamhill': 100,
     'paddypower': 100,
@@ -126,7 +132,7 @@ INITIAL_BALANCES = {
     'virginbet': 50,
     'spreadex': 50,
     'livescorebet': 50
-}
+})
 
 
 # =============================================================================
@@ -169,27 +175,90 @@ QUIET_HOURS_END = None    # e.g., "07:00" for 7 AM
 # VALIDATION
 # =============================================================================
 
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Read-only snapshot of the settings above, validated once when built"""
+    odds_api_key: str
+    telegram_bot_token: str
+    your_telegram_user_id: int
+    min_profit_percent: float
+    default_stake: float
+    scan_interval: int
+    max_alerts_per_scan: int
+    bookmakers: FrozenSet[str]
+    sports: Tuple[str, ...]
+    max_concurrent_arbs: int
+    min_time_before_event: float
+    odds_change_warning_threshold: float
+    initial_balances: Mapping[str, float]
+    database_path: str
+    log_file: str
+    timezone: str
+    api_timeout: int
+    api_max_retries: int
+    daily_report_enabled: bool
+    daily_report_time: str
+    enable_notifications: bool
+    quiet_hours_start: Optional[str]
+    quiet_hours_end: Optional[str]
+    errors: Tuple[str, ...] = field(init=False, default=())
+    
+    def __post_init__(self):
+        """Collect configuration problems (see validate_config)"""
+        errors = []
+        
+        if self.odds_api_key == "YOUR_ODDS_API_KEY_HERE":
+            errors.append("❌ ODDS_API_KEY not set! Get one from https://the-odds-api.com/")
+        
+        if self.telegram_bot_token == "YOUR_TELEGRAM_BOT_TOKEN_HERE":
+            errors.append("❌ TELEGRAM_BOT_TOKEN not set! Get one from @BotFather on Telegram")
+        
+        if self.your_telegram_user_id == 0:
+            errors.append("❌ YOUR_TELEGRAM_USER_ID not set! Get it from @userinfobot on Telegram")
+        
+        if self.min_profit_percent < 1.0:
+            errors.append("⚠️  MIN_PROFIT_PERCENT is very low (<1%). You might get too many alerts.")
+        
+        if self.default_stake < 100:
+            errors.append("⚠️  DEFAULT_STAKE is very low. Profits will be small.")
+        
+        if len(self.bookmakers) < 5:
+            errors.append("⚠️  You're monitoring fewer than 5 bookmakers. Add more for better opportunities.")
+        
+        # Frozen dataclass: bypass the generated __setattr__
+        object.__setattr__(self, 'errors', tuple(errors))
+
+
+CONFIG = Config(
+    odds_api_key=ODDS_API_KEY,
+    telegram_bot_token=TELEGRAM_BOT_TOKEN,
+    your_telegram_user_id=YOUR_TELEGRAM_USER_ID,
+    min_profit_percent=MIN_PROFIT_PERCENT,
+    default_stake=DEFAULT_STAKE,
+    scan_interval=SCAN_INTERVAL,
+    max_alerts_per_scan=MAX_ALERTS_PER_SCAN,
+    bookmakers=BOOKMAKERS,
+    sports=SPORTS,
+    max_concurrent_arbs=MAX_CONCURRENT_ARBS,
+    min_time_before_event=MIN_TIME_BEFORE_EVENT,
+    odds_change_warning_threshold=ODDS_CHANGE_WARNING_THRESHOLD,
+    initial_balances=INITIAL_BALANCES,
+    database_path=DATABASE_PATH,
+    log_file=LOG_FILE,
+    timezone=TIMEZONE,
+    api_timeout=API_TIMEOUT,
+    api_max_retries=API_MAX_RETRIES,
+    daily_report_enabled=DAILY_REPORT_ENABLED,
+    daily_report_time=DAILY_REPORT_TIME,
+    enable_notifications=ENABLE_NOTIFICATIONS,
+    quiet_hours_start=QUIET_HOURS_START,
+    quiet_hours_end=QUIET_HOURS_END,
+)
+
+
 def validate_config():
     """Check if configuration is valid"""
-    errors = []
-    
-    if ODDS_API_KEY == "YOUR_ODDS_API_KEY_HERE":
-        errors.append("❌ ODDS_API_KEY not set! Get one from https://the-odds-api.com/")
-    
-    if TELEGRAM_BOT_TOKEN == "YOUR_TELEGRAM_BOT_TOKEN_HERE":
-        errors.append("❌ TELEGRAM_BOT_TOKEN not set! Get one from @BotFather on Telegram")
-    
-    if YOUR_TELEGRAM_USER_ID == 0:
-        errors.append("❌ YOUR_TELEGRAM_USER_ID not set! Get it from @userinfobot on Telegram")
-    
-    if MIN_PROFIT_PERCENT < 1.0:
-        errors.append("⚠️  MIN_PROFIT_PERCENT is very low (<1%). You might get too many alerts.")
-    
-    if DEFAULT_STAKE < 100:
-        errors.append("⚠️  DEFAULT_STAKE is very low. Profits will be small.")
-    
-    if len(BOOKMAKERS) < 5:
-        errors.append("⚠️  You're monitoring fewer than 5 bookmakers. Add more for better opportunities.")
+    errors = CONFIG.errors
     
     if errors:
         print("\n" + "="*60)
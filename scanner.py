@@ -5,10 +5,12 @@ Monitors 20+ bookmakers for guaranteed profit opportunities
 
 import asyncio
 import aiohttp
+import orjson
+from aiolimiter import AsyncLimiter
 import logging
-from datetime import datetime
-from typing import List, Dict, Optional
-import json
+import math
+import time
+from typing import List, Dict, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +30,10 @@ class ArbitrageScanner:
             'ladbrokes', 'coral', 'betvictor', 'unibet', 'betfred',
             'boylesports', 'betway', 'virginbet', 'spreadex', 'livescorebet'
         ]
+        # Built once: the query-string value sent with every request and a
+        # set for skipping bookmakers we don't monitor
+        self._bookmakers_param = ','.join(self.bookmakers)
+        self._known_bookmakers = frozenset(self.bookmakers)
         
         # Sports to monitor (all major UK markets)
         self.sports = [
@@ -43,50 +49,110 @@ class ArbitrageScanner:
             'icehockey_nhl'            # NHL
         ]
         
+        # Token bucket shared by all odds requests (tune to the API quota)
+        self._limiter = AsyncLimiter(max_rate=5, time_period=1.0)
+        
+        # Upper bound (seconds) on a single odds request, so one slow sport
+        # can't hold up the whole scan
+        self.request_timeout = 10
+        
+        # Shared HTTP session (created lazily inside the running event loop)
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Recent odds per sport: {sport: (fetched_at, data)}. Back-to-back
+        # scans (e.g. several /scan commands) reuse them instead of
+        # spending API quota on identical requests.
+        self.cache_ttl = 60
+        self._cache: Dict[str, Tuple[float, List[Dict]]] = {}
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            # Bounded pool for a single-host API: reuse idle keep-alive
+            # connections for up to 75s and clean up ones closed mid-TLS
+            connector = aiohttp.TCPConnector(
+                limit=32, limit_per_host=8, ttl_dns_cache=300,
+                enable_cleanup_closed=True, keepalive_timeout=75
+            )
+            timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        
     async def fetch_odds(self, sport: str) -> Optional[List[Dict]]:
         """Fetch current odds for a specific sport"""
+        now = time.monotonic()
+        hit = self._cache.get(sport)
+        if hit and now - hit[0] < self.cache_ttl:
+            return hit[1]
+        
         url = f"{self.base_url}/sports/{sport}/odds"
         params = {
             'apiKey': self.api_key,
             'regions': 'uk',
             'markets': 'h2h',  # Head to head (match winner)
             'oddsFormat': 'decimal',
-            'bookmakers': ','.join(self.bookmakers)
+            'bookmakers': self._bookmakers_param
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
+            session = await self._get_session()
+            async with self._limiter:
+                logger.info("Fetching odds for %s...", sport)
                 async with session.get(url, params=params) as response:
                     if response.status == 200:
-                        data = await response.json()
+                        # orjson decodes the raw bytes directly (several times
+                        # faster than the stdlib json used by response.json())
+                        data = orjson.loads(await response.read())
+                        self._cache[sport] = (now, data)
                         return data
                     else:
-                        logger.error(f"API error for {sport}: {response.status}")
+                        logger.error("API error for %s: %s", sport, response.status)
                         return None
         except Exception as e:
-            logger.error(f"Error fetching odds for {sport}: {e}")
+            logger.error("Error fetching odds for %s: %s", sport, e)
             return None
     
     def calculate_arbitrage(self, odds_data: List[Dict]) -> List[Dict]:
         """
         Calculate arbitrage opportunities from odds data
         
+        Works for any number of mutually exclusive outcomes (2-way tennis,
+        3-way football, ...): backing every outcome at its best price locks
+        in a profit exactly when sum(1 / best_price) < 1.
+        
         Returns list of profitable arbitrage opportunities
         """
         opportunities = []
         
+        # profit_percent >= min_profit_percent  <=>
+        # inverse_sum <= 1 / (1 + min_profit_percent / 100), so each event is
+        # screened with one comparison and profit is only computed for survivors
+        max_inverse_sum = 1.0 / (1.0 + self.min_profit_percent / 100.0)
+        known_bookmakers = self._known_bookmakers
+        
+        # Loop-invariant lookups bound once; every opportunity in a batch
+        # shares the batch's timestamp (Unix seconds)
+        fsum = math.fsum
+        append = opportunities.append
+        timestamp = time.time()
+        
         for event in odds_data:
             if not event.get('bookmakers'):
                 continue
-                
-            event_name = f"{event['home_team']} vs {event['away_team']}"
-            sport = event.get('sport_title', 'Unknown')
-            commence_time = event.get('commence_time', '')
             
-            # Extract all odds for this event
-            all_odds = {}
+            # Best (price, bookmaker) for each outcome of this event, and the
+            # most outcomes any bookmaker lists for it (e.g. 3 with a draw)
+            best = {}
+            num_outcomes = 0
             for bookmaker in event['bookmakers']:
                 bookie_name = bookmaker['key']
+                if bookie_name not in known_bookmakers:
+                    continue
                 markets = bookmaker.get('markets', [])
                 
                 for market in markets:
@@ -94,57 +160,88 @@ class ArbitrageScanner:
                         continue
                         
                     outcomes = market.get('outcomes', [])
+                    num_outcomes = max(num_outcomes, len(outcomes))
+                    
+                    # A missing/invalid price (decimal odds must be > 1.0)
+                    # drops the bookmaker's whole market: skipping just that
+                    # outcome could leave a leg (e.g. the draw) uncovered
+                    if any(not outcome.get('price') or outcome['price'] <= 1.0
+                           for outcome in outcomes):
+                        break
+                    
                     for outcome in outcomes:
                         outcome_name = outcome['name']
                         price = outcome['price']
                         
                         # Store best odds for each outcome
-                        if outcome_name not in all_odds:
-                            all_odds[outcome_name] = {'price': price, 'bookmaker': bookie_name}
-                        elif price > all_odds[outcome_name]['price']:
-                            all_odds[outcome_name] = {'price': price, 'bookmaker': bookie_name}
+                        current = best.get(outcome_name)
+                        if current is None or price > current[0]:
+                            best[outcome_name] = (price, bookie_name)
+                    
+                    # Each bookmaker lists a market once, so the rest of its
+                    # markets can't contribute anything
+                    break
             
             # Check if we have odds for all outcomes
-            if len(all_odds) < 2:
+            if len(best) < max(num_outcomes, 2):
                 continue
             
             # Calculate if arbitrage exists
-            inverse_sum = sum(1.0 / odds['price'] for odds in all_odds.values())
+            inverse_sum = fsum(1.0 / price for price, _ in best.values())
             
-            # If inverse sum < 1.0, we have an arbitrage opportunity
-            if inverse_sum < 1.0:
+            # Arbitrage exists when the inverse sum is below 1.0; it is only
+            # reported when it also clears the profit threshold
+            if inverse_sum < 1.0 and inverse_sum <= max_inverse_sum:
                 profit_percent = ((1.0 / inverse_sum) - 1.0) * 100
                 
-                # Only include if profit meets minimum threshold
-                if profit_percent >= self.min_profit_percent:
-                    opportunities.append({
-                        'event': event_name,
-                        'sport': sport,
-                        'commence_time': commence_time,
-                        'profit_percent': round(profit_percent, 2),
-                        'outcomes': all_odds,
-                        'timestamp': datetime.now().isoformat()
-                    })
+                # Event details and per-outcome dicts are only built for
+                # the (rare) survivors; each outcome's share of the total
+                # stake is kept so stake sizing is one multiply per outcome
+                all_odds = {
+                    name: {'price': price, 'bookmaker': bookie}
+                    for name, (price, bookie) in best.items()
+                }
+                stake_shares = {
+                    name: (1.0 / price) / inverse_sum for name, (price, _) in best.items()
+                }
+                append({
+                    'event': f"{event['home_team']} vs {event['away_team']}",
+                    'sport': event.get('sport_title', 'Unknown'),
+                    'commence_time': event.get('commence_time', ''),
+                    'profit_percent': round(profit_percent, 2),
+                    'outcomes': all_odds,
+                    'stake_shares': stake_shares,
+                    'inverse_sum': inverse_sum,
+                    'timestamp': timestamp
+                })
         
         return opportunities
     
-    def calculate_stakes(self, total_stake: float, outcomes: Dict) -> Dict:
+    def calculate_stakes(self, total_stake: float, outcomes: Dict,
+                         stake_shares: Optional[Dict[str, float]] = None) -> Dict:
         """
         Calculate exact stake amounts for each outcome to guarantee profit
         
         Args:
             total_stake: Total amount to invest (e.g., £1000)
             outcomes: Dict of outcomes with their best odds
+            stake_shares: Precomputed fraction of total_stake per outcome
+                          (from calculate_arbitrage)
         
         Returns:
             Dict with stake amounts for each outcome
         """
-        inverse_sum = sum(1.0 / outcome['price'] for outcome in outcomes.values())
+        if stake_shares is None:
+            inverse_sum = math.fsum(1.0 / outcome['price'] for outcome in outcomes.values())
+            stake_shares = {
+                name: (1.0 / outcome['price']) / inverse_sum
+                for name, outcome in outcomes.items()
+            }
         
         stakes = {}
         for outcome_name, odds_data in outcomes.items():
             # Calculate proportional stake
-            stake = (total_stake / odds_data['price']) / inverse_sum
+            stake = total_stake * stake_shares[outcome_name]
             stakes[outcome_name] = {
                 'stake': round(stake, 2),
                 'bookmaker': odds_data['bookmaker'],
@@ -156,22 +253,19 @@ class ArbitrageScanner:
     
     async def scan_all_sports(self) -> List[Dict]:
         """Scan all configured sports for arbitrage opportunities"""
-        logger.info(f"Scanning {len(self.sports)} sports for arbitrage...")
+        logger.info("Scanning %d sports for arbitrage...", len(self.sports))
         
         all_opportunities = []
         
-        for sport in self.sports:
-            logger.info(f"Fetching odds for {sport}...")
-            odds_data = await self.fetch_odds(sport)
-            
+        # Fetch all sports concurrently; the rate limiter paces the requests
+        results = await asyncio.gather(*(self.fetch_odds(sport) for sport in self.sports))
+        
+        for sport, odds_data in zip(self.sports, results):
             if odds_data:
                 opportunities = self.calculate_arbitrage(odds_data)
                 if opportunities:
-                    logger.info(f"Found {len(opportunities)} arbitrage opportunities in {sport}")
+                    logger.info("Found %d arbitrage opportunities in %s", len(opportunities), sport)
                     all_opportunities.extend(opportunities)
-            
-            # Respect API rate limits
-            await asyncio.sleep(1)
         
         # Sort by profit percentage (highest first)
         all_opportunities.sort(key=lambda x: x['profit_percent'], reverse=True)
@@ -185,31 +279,32 @@ class ArbitrageScanner:
         Args:
             interval_seconds: Time between scans (default 5 minutes)
         """
-        logger.info(f"Starting continuous scan (every {interval_seconds} seconds)...")
+        logger.info("Starting continuous scan (every %s seconds)...", interval_seconds)
         
         while True:
             try:
                 opportunities = await self.scan_all_sports()
                 
-                if opportunities:
-                    logger.info(f"\n{'='*60}")
-                    logger.info(f"FOUND {len(opportunities)} ARBITRAGE OPPORTUNITIES")
-                    logger.info(f"{'='*60}\n")
+                # Skip building the summary entirely when INFO is filtered out
+                if opportunities and logger.isEnabledFor(logging.INFO):
+                    logger.info("\n%s", '=' * 60)
+                    logger.info("FOUND %d ARBITRAGE OPPORTUNITIES", len(opportunities))
+                    logger.info("%s\n", '=' * 60)
                     
                     for opp in opportunities[:5]:  # Show top 5
-                        logger.info(f"Event: {opp['event']}")
-                        logger.info(f"Sport: {opp['sport']}")
-                        logger.info(f"Profit: {opp['profit_percent']}%")
-                        logger.info(f"Outcomes: {len(opp['outcomes'])}")
+                        logger.info("Event: %s", opp['event'])
+                        logger.info("Sport: %s", opp['sport'])
+                        logger.info("Profit: %s%%", opp['profit_percent'])
+                        logger.info("Outcomes: %d", len(opp['outcomes']))
                         logger.info("-" * 60)
-                else:
+                elif not opportunities:
                     logger.info("No arbitrage opportunities found in this scan.")
                 
                 # Wait before next scan
                 await asyncio.sleep(interval_seconds)
                 
             except Exception as e:
-                logger.error(f"Error in continuous scan: {e}")
+                logger.error("Error in continuous scan: %s", e)
                 await asyncio.sleep(60)  # Wait 1 minute before retrying
 
 
@@ -237,7 +332,9 @@ async def main():
             print(f"\nOUTCOMES:")
             
             # Calculate stakes for £1000 total investment
-            stakes = scanner.calculate_stakes(1000, opp['outcomes'])
+            stakes = scanner.calculate_stakes(
+                1000, opp['outcomes'], opp['stake_shares']
+            )
             
             for outcome, stake_data in stakes.items():
                 print(f"  {outcome}:")
@@ -250,6 +347,8 @@ async def main():
             print(f"{'='*80}\n")
     else:
         print("No arbitrage opportunities found.")
+    
+    await scanner.close()
 
 
 if __name__ == "__main__":
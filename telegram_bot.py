@@ -5,24 +5,68 @@ Sends instant notifications with bet placement instructions
 
 import asyncio
 import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from aiolimiter import AsyncLimiter
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from scanner import ArbitrageScanner
-from datetime import datetime
-import json
+from bet_tracker import BetTracker
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _outcomes_key(opportunity: dict) -> Tuple[Tuple[str, float, str], ...]:
+    """Hashable form of an opportunity's best odds"""
+    return tuple(
+        (name, odds['price'], odds['bookmaker'])
+        for name, odds in opportunity['outcomes'].items()
+    )
+
+
+def _alert_key(opportunity: dict) -> tuple:
+    """Identify an opportunity across scans (same event at the same odds)"""
+    return (opportunity['event'], opportunity['commence_time'], _outcomes_key(opportunity))
+
+
 class TelegramArbBot:
     """Telegram bot that sends arbitrage alerts"""
     
-    def __init__(self, telegram_token: str, odds_api_key: str):
+    def __init__(self, telegram_token: str, odds_api_key: str, db_path: str = "bets.db"):
         self.telegram_token = telegram_token
         self.scanner = ArbitrageScanner(api_key=odds_api_key, min_profit_percent=2.0)
         self.application = None
-        self.user_settings = {}  # Store user preferences
+        
+        # Settings, found opportunities and placed bets are persisted in
+        # SQLite; user_settings is the in-memory copy, written through on
+        # every change
+        self.tracker = BetTracker(db_path)
+        self.user_settings = self.tracker.get_user_settings()
+        
+        # Database id of each opportunity in the latest scan, by _alert_key,
+        # so an arb that survives several scans is only logged once
+        self._opportunity_ids: Dict[tuple, int] = {}
+        
+        # Most recent scan as (monotonic time, opportunities); /scan reuses it
+        # while it is fresh instead of starting another full scan
+        self._last_scan: Tuple[float, List[Dict]] = (float('-inf'), [])
+        self.scan_reuse_seconds = 30
+        # Scan currently running, if any; overlapping /scan commands and the
+        # scheduled scan all wait on it instead of starting their own
+        self._scan_task: Optional[asyncio.Task] = None
+        
+        # Telegram allows ~30 messages/second overall and 1/second per chat;
+        # alerts are sent concurrently within both limits. aiolimiter is a
+        # leaky bucket that lets a full max_rate burst through before
+        # draining, so the global limit is one message per 1/25 s (no burst)
+        self._send_limiter = AsyncLimiter(1, 1 / 25)
+        self._chat_limiters = defaultdict(lambda: AsyncLimiter(1, 1))
+        
+        # (user_id, _alert_key) pairs already alerted and still on offer, so
+        # an arb that survives several scans is only sent once
+        self._alerted = set()
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -63,12 +107,14 @@ Ready to make guaranteed profit? Let's go! 🚀
                 'notifications_enabled': True,
                 'sports_filter': 'all'
             }
+            await asyncio.to_thread(self.tracker.save_user_settings, user_id, self.user_settings[user_id])
     
     async def scan_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /scan command - run immediate scan"""
-        await update.message.reply_text("🔍 Scanning all bookmakers... This will take 20-30 seconds.")
-        
-        opportunities = await self.scanner.scan_all_sports()
+        scanned_at, opportunities = self._last_scan
+        if time.monotonic() - scanned_at >= self.scan_reuse_seconds:
+            await update.message.reply_text("🔍 Scanning all bookmakers... This will take 20-30 seconds.")
+            opportunities = await self._scan()
         
         if opportunities:
             await update.message.reply_text(f"✅ Found {len(opportunities)} arbitrage opportunities!")
@@ -83,19 +129,66 @@ Ready to make guaranteed profit? Let's go! 🚀
                 "I'll keep scanning and alert you automatically."
             )
     
-    async def send_arbitrage_alert(self, chat_id: int, opportunity: dict, context: ContextTypes.DEFAULT_TYPE):
-        """Send formatted arbitrage alert to user"""
+    async def _scan(self) -> List[Dict]:
+        """Run a full scan, or join the one in progress"""
+        if self._scan_task is None:
+            self._scan_task = asyncio.create_task(self._run_scan())
+        # Shielded so a cancelled caller doesn't cancel everyone's scan
+        return await asyncio.shield(self._scan_task)
+    
+    async def _run_scan(self) -> List[Dict]:
+        """Scan all sports, log new opportunities and remember the result for /scan"""
+        try:
+            opportunities = await self.scanner.scan_all_sports()
+            # Runs once per shared scan, so overlapping callers can't log
+            # the same arb twice
+            await self._record_opportunities(opportunities)
+            self._last_scan = (time.monotonic(), opportunities)
+            return opportunities
+        finally:
+            self._scan_task = None
+    
+    async def _record_opportunities(self, opportunities: List[Dict]):
+        """Set each opportunity's database 'id', logging the ones not seen last scan"""
+        ids = {}
+        new = []
+        for opp in opportunities:
+            key = _alert_key(opp)
+            opportunity_id = self._opportunity_ids.get(key)
+            if opportunity_id is None:
+                new.append((key, opp))
+            else:
+                opp['id'] = ids[key] = opportunity_id
+        
+        if new:
+            # Logged at the default £1000 stake; placed bets scale it per user.
+            # One write per scan, run off the event loop (it may wait on the
+            # database lock for up to busy_timeout)
+            calculate_stakes = self.scanner.calculate_stakes
+            logged = await asyncio.to_thread(self.tracker.log_opportunities, [
+                (opp, calculate_stakes(1000, opp['outcomes'], opp.get('stake_shares')), 1000)
+                for _, opp in new
+            ])
+            for (key, opp), opportunity_id in zip(new, logged):
+                opp['id'] = ids[key] = opportunity_id
+        
+        self._opportunity_ids = ids
+    
+    async def send_arbitrage_alert(self, chat_id: int, opportunity: dict, context: ContextTypes.DEFAULT_TYPE) -> bool:
+        """Send formatted arbitrage alert to user (returns whether it was delivered)"""
         
         # Calculate stakes for default amount
         default_stake = self.user_settings.get(chat_id, {}).get('default_stake', 1000)
-        stakes = self.scanner.calculate_stakes(default_stake, opportunity['outcomes'])
+        stakes = self.scanner.calculate_stakes(
+            default_stake, opportunity['outcomes'], opportunity.get('stake_shares')
+        )
         
         # Calculate guaranteed profit
         first_return = list(stakes.values())[0]['potential_return']
         profit = first_return - default_stake
         
-        # Format the alert message
-        alert_text = f"""
+        # Format the alert message (pieces are joined once at the end)
+        parts = [f"""
 🚨 **ARBITRAGE FOUND**
 
 **Event:** {opportunity['event']}
@@ -105,31 +198,34 @@ Ready to make guaranteed profit? Let's go! 🚀
 
 **YOUR BETS (Total: £{default_stake}):**
 
-"""
+"""]
         
         # Add each bet
-        for i, (outcome, stake_data) in enumerate(stakes.items(), 1):
-            alert_text += f"""**BET {i}: {outcome}**
+        parts.extend(
+            f"""**BET {i}: {outcome}**
 💷 Stake: £{stake_data['stake']}
 📊 Odds: {stake_data['odds']}
 🏢 Bookmaker: {stake_data['bookmaker'].upper()}
 💰 Returns: £{stake_data['potential_return']}
 
 """
+            for i, (outcome, stake_data) in enumerate(stakes.items(), 1)
+        )
         
-        alert_text += f"""
+        parts.append(f"""
 ✅ **GUARANTEED PROFIT: £{round(profit, 2)}**
 
 ⏱️ **ACT QUICKLY** - Odds can change in 2-5 minutes!
 
 💡 **TIP:** Open all bookmaker tabs first, then place bets simultaneously.
-"""
+""")
+        alert_text = "".join(parts)
         
         # Create action buttons
         keyboard = [
-            [InlineKeyboardButton("✅ Placed All Bets", callback_data=f"placed_{opportunity['timestamp']}")],
-            [InlineKeyboardButton("⏭️ Skip This", callback_data=f"skip_{opportunity['timestamp']}")],
-            [InlineKeyboardButton("📊 Recalculate Stakes", callback_data=f"recalc_{opportunity['timestamp']}")]
+            [InlineKeyboardButton("✅ Placed All Bets", callback_data=f"placed_{opportunity['id']}_{default_stake}")],
+            [InlineKeyboardButton("⏭️ Skip This", callback_data=f"skip_{opportunity['id']}")],
+            [InlineKeyboardButton("📊 Recalculate Stakes", callback_data=f"recalc_{opportunity['id']}")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
@@ -142,6 +238,13 @@ Ready to make guaranteed profit? Let's go! 🚀
             )
         except Exception as e:
             logger.error(f"Error sending alert: {e}")
+            return False
+        return True
+    
+    async def _send_guarded(self, chat_id: int, opportunity: dict, context: ContextTypes.DEFAULT_TYPE) -> bool:
+        """Send an alert once both the global and the per-chat rate limits allow it"""
+        async with self._send_limiter, self._chat_limiters[chat_id]:
+            return await self.send_arbitrage_alert(chat_id, opportunity, context)
     
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button presses"""
@@ -151,6 +254,10 @@ Ready to make guaranteed profit? Let's go! 🚀
         data = query.data
         
         if data.startswith("placed_"):
+            _, opportunity_id, stake = data.split("_")
+            await asyncio.to_thread(
+                self.tracker.record_placed_bet, query.from_user.id, int(opportunity_id), float(stake)
+            )
             await query.edit_message_text(
                 "✅ Great! Bets recorded. Good luck! 🍀\n\n"
                 "I'll continue scanning for more opportunities."
@@ -189,20 +296,24 @@ To change settings, use:
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /stats command"""
-        # In a real implementation, this would pull from a database
-        stats_text = """
+        user_id = update.effective_user.id
+        found = self.tracker.get_stats('week')['total_opportunities']
+        week = self.tracker.get_user_stats(user_id, 'week')
+        all_time = self.tracker.get_user_stats(user_id, 'all')
+        
+        stats_text = f"""
 📊 **Your Arbitrage Stats**
 
 **This Week:**
-Opportunities found: 47
-Bets placed: 23
-Total profit: £847.50
-Average ROI: 3.8%
+Opportunities found: {found}
+Bets placed: {week['bets_placed']}
+Total profit: £{week['total_profit']:,.2f}
+Average ROI: {week['average_roi']}%
 
 **All Time:**
-Total profit: £2,341.00
+Total profit: £{all_time['total_profit']:,.2f}
 Win rate: 100% (guaranteed!)
-Bets placed: 89
+Bets placed: {all_time['bets_placed']}
 
 🎯 Keep it up!
         """
@@ -260,18 +371,49 @@ Need more help? Message @YourSupportUsername
         while True:
             try:
                 logger.info("Running scheduled scan...")
-                opportunities = await self.scanner.scan_all_sports()
+                opportunities = await self._scan()
                 
                 if opportunities:
                     logger.info(f"Found {len(opportunities)} opportunities, sending alerts...")
                     
-                    # Send alerts to all users with notifications enabled
-                    for user_id, settings in self.user_settings.items():
-                        if settings.get('notifications_enabled', True):
-                            for opp in opportunities:
-                                if opp['profit_percent'] >= settings.get('min_profit', 2.0):
-                                    await self.send_arbitrage_alert(user_id, opp, context)
-                                    await asyncio.sleep(1)  # Avoid rate limits
+                    # Users with notifications enabled whose threshold each
+                    # opportunity clears, skipping alerts already sent for it
+                    eligible_by_opp = []
+                    alerted = set()
+                    for opp in opportunities:
+                        key = _alert_key(opp)
+                        user_ids = []
+                        for user_id, settings in self.user_settings.items():
+                            if not (settings.get('notifications_enabled', True)
+                                    and opp['profit_percent'] >= settings.get('min_profit', 2.0)):
+                                continue
+                            if (user_id, key) in self._alerted:
+                                alerted.add((user_id, key))
+                            else:
+                                user_ids.append(user_id)
+                        eligible_by_opp.append((opp, key, user_ids))
+                    
+                    pairs = [
+                        (user_id, key)
+                        for _, key, user_ids in eligible_by_opp
+                        for user_id in user_ids
+                    ]
+                    results = await asyncio.gather(*(
+                        self._send_guarded(user_id, opp, context)
+                        for opp, _, user_ids in eligible_by_opp
+                        for user_id in user_ids
+                    ), return_exceptions=True)
+                    
+                    # Only delivered alerts for opportunities still live are
+                    # remembered; failed sends are retried next scan
+                    for pair, result in zip(pairs, results):
+                        if isinstance(result, BaseException):
+                            logger.error(f"Error sending alert: {result}")
+                        elif result:
+                            alerted.add(pair)
+                    self._alerted = alerted
+                else:
+                    self._alerted = set()
                 
                 # Wait 5 minutes before next scan
                 await asyncio.sleep(300)
@@ -280,15 +422,36 @@ Need more help? Message @YourSupportUsername
                 logger.error(f"Error in continuous scanning: {e}")
                 await asyncio.sleep(60)
     
+    async def housekeeping(self):
+        """Background task that returns freed database pages to disk once a day"""
+        while True:
+            await asyncio.sleep(24 * 60 * 60)
+            try:
+                await asyncio.to_thread(self.tracker.reclaim_space)
+            except Exception as e:
+                logger.error(f"Error reclaiming database space: {e}")
+    
     async def post_init(self, application: Application):
         """Initialize background tasks"""
         # Start the continuous scanner
         asyncio.create_task(self.continuous_scanning(application))
+        asyncio.create_task(self.housekeeping())
+    
+    async def post_shutdown(self, application: Application):
+        """Release the scanner's HTTP session and the database"""
+        await self.scanner.close()
+        self.tracker.close()
     
     def run(self):
         """Start the Telegram bot"""
         # Create the Application
-        self.application = Application.builder().token(self.telegram_token).post_init(self.post_init).build()
+        self.application = (
+            Application.builder()
+            .token(self.telegram_token)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
         
         # Add command handlers
         self.application.add_handler(CommandHandler("start", self.start_command))